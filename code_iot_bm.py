@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import time
+from collections import deque
 
 # --- Game Constants & Difficulty Settings ---
 STARTING_CASH = 15.0  # Million USD
 QUARTERS_TOTAL = 12
 WINNING_VALUATION = 150.0 
+RANDOM_SEED = None  # Set an int to replay the same Chaos Monkey rolls every game
 
 # Business Model Dynamics
 # Margin: Profitability %
@@ -18,6 +19,38 @@ MODELS = {
     "Process":     {"margin": 0.55, "cannibalization": 0.1},
     "Cloud":       {"margin": 0.85, "cannibalization": 0.0} 
 }
+REVENUE_STREAMS = ("Traditional", "Service", "Process", "Cloud")  # Order of st.session_state.rev
+I_TRAD, I_SERV, I_PROC, I_CLOUD = 0, 1, 2, 3
+
+# Valuation Multipliers based on revenue quality
+# Hardware = 1x, Service = 3x, SaaS/Cloud = 10x
+WEIGHTS = np.array([1.0, 3.0, 6.0, 10.0])
+CANN = np.array([MODELS[k]["cannibalization"] for k in REVENUE_STREAMS])
+
+# Organization Health, order of st.session_state.metrics
+I_TECH, I_SALES, I_TRUST = 0, 1, 2
+
+STRATEGY_OPTIONS = (
+    "Defend Core (Hardware)",
+    "Launch Service (Predictive Maint)",
+    "Launch Process (Optimization)",
+    "Launch Cloud (Platform)"
+)
+S_DEFEND, S_SERVICE, S_PROCESS, S_CLOUD = 0, 1, 2, 3
+STRATEGY_IDX = {s: i for i, s in enumerate(STRATEGY_OPTIONS)}
+# Multiplier on Traditional revenue after the base decline, per strategy
+CORE_DEFENSE = np.array([1.03, 1.0, 1.0, 1.0])
+
+# Event codes reported by _step(), translated into log_event calls
+LOG_NONE, LOG_MORALE, LOG_SERVICE, LOG_PROCESS_FAIL, LOG_CLOUD_OK, LOG_CLOUD_FAIL = range(6)
+LOG_ICONS = {"warning": "⚠️", "danger": "🔥", "success": "✅"}
+LOG_MESSAGES = {
+    LOG_MORALE: ("Sales team demoralized due to lack of training!", "warning"),
+    LOG_SERVICE: ("Service contracts growing. Spare parts revenue declining.", "info"),
+    LOG_PROCESS_FAIL: ("Process Launch Failed! Trust too low.", "danger"),
+    LOG_CLOUD_OK: ("Cloud Platform scaling!", "success"),
+    LOG_CLOUD_FAIL: ("Cloud Launch Disaster! Product buggy or no trust.", "danger"),
+}
 
 # --- State Initialization ---
 if 'game_active' not in st.session_state:
@@ -25,44 +58,122 @@ if 'game_active' not in st.session_state:
     st.session_state.quarter = 1
     st.session_state.cash = STARTING_CASH
     st.session_state.valuation = 0
-    st.session_state.logs = []
+    st.session_state.logs = deque(maxlen=8)
+    # Chaos Monkey rolls for every quarter, drawn once per game
+    st.session_state.rng_draws = np.random.default_rng(RANDOM_SEED).random(QUARTERS_TOTAL + 1)
     
     # Metrics
-    st.session_state.revenue = {"Traditional": 12.0, "Service": 0.0, "Process": 0.0, "Cloud": 0.0}
-    st.session_state.metrics = {
-        "Tech_Maturity": 10.0,  # Quality of the product
-        "Sales_Morale": 80.0,   # Ability to sell (Apex Concept)
-        "Customer_Trust": 40.0  # Willingness to buy digital (Orion Concept)
-    }
+    st.session_state.rev = np.array([12.0, 0.0, 0.0, 0.0])
+    st.session_state.metrics = np.array([
+        10.0,  # Tech_Maturity: Quality of the product
+        80.0,  # Sales_Morale: Ability to sell (Apex Concept)
+        40.0   # Customer_Trust: Willingness to buy digital (Orion Concept)
+    ])
     
     # History for Charts
-    st.session_state.history = pd.DataFrame(columns=['Quarter', 'Cash', 'Valuation', 'Revenue'])
+    st.session_state.history_rows = []
 
 # --- Helper Functions ---
 def log_event(message, type="info"):
-    icon = "ℹ️"
-    if type == "warning": icon = "⚠️"
-    if type == "danger": icon = "🔥"
-    if type == "success": icon = "✅"
-    st.session_state.logs.insert(0, f"{icon} Q{st.session_state.quarter}: {message}")
+    icon = LOG_ICONS.get(type, "ℹ️")
+    st.session_state.logs.appendleft(f"{icon} Q{st.session_state.quarter}: {message}")
+
+@st.cache_resource
+def _margins():
+    return np.array([MODELS[k]["margin"] for k in REVENUE_STREAMS])
+
+@st.cache_data(max_entries=64)
+def _valuation(rev_tuple):
+    return float(np.array(rev_tuple) @ WEIGHTS)
+
+@st.cache_data(max_entries=64)
+def _rev_series(rev_tuple):
+    return pd.Series(rev_tuple, index=REVENUE_STREAMS, name="Revenue")
 
 def calculate_valuation():
-    # Valuation Multipliers based on revenue quality
-    # Hardware = 1x, Service = 3x, SaaS/Cloud = 10x
-    val = (st.session_state.revenue["Traditional"] * 1.0) + \
-          (st.session_state.revenue["Service"] * 3.0) + \
-          (st.session_state.revenue["Process"] * 6.0) + \
-          (st.session_state.revenue["Cloud"] * 10.0)
-    return val
+    return _valuation(tuple(st.session_state.rev.tolist()))
+
+# --- Simulation Step ---
+def _step(rev, metrics, cash, strategy_id, spend_rd, spend_change, spend_marketing):
+    log_codes = np.zeros(2, dtype=np.int64)
+
+    # 2. Update Organizational Metrics (The "Soft" Skills)
+    # R&D increases Tech, but decays slightly
+    metrics[I_TECH] += (spend_rd * 4) - 1
+    
+    # Change Mgmt increases Morale. If you spend 0, Morale tanks (Apex Scenario)
+    if spend_change < 0.5:
+        metrics[I_SALES] -= 10
+        log_codes[0] = LOG_MORALE
+    else:
+        metrics[I_SALES] += (spend_change * 3)
+        
+    # Marketing increases Trust
+    metrics[I_TRUST] += (spend_marketing * 3) - 0.5
+    
+    # Cap metrics at 100
+    np.clip(metrics, 0.0, 100.0, out=metrics)
+
+    # 3. Calculate Revenue Impact based on Strategy
+    
+    # Multipliers based on Org Health
+    tech_factor = metrics[I_TECH] / 100
+    sales_factor = metrics[I_SALES] / 100
+    trust_factor = metrics[I_TRUST] / 100
+    
+    # BASE DECLINE of Traditional Hardware (Commoditization)
+    rev[I_TRAD] *= 0.95 
+    rev[I_TRAD] *= CORE_DEFENSE[strategy_id] # Defend Core mitigates decline
+    
+    if strategy_id == S_SERVICE:
+        # Low Tech requirement, High Sales requirement
+        growth = 1.5 * sales_factor
+        rev[I_SERV] += growth
+        # Cannibalization Effect (Apex)
+        rev[I_TRAD] -= (growth * CANN[I_SERV])
+        log_codes[1] = LOG_SERVICE
+
+    elif strategy_id == S_PROCESS:
+        # Needs Trust and Tech
+        if trust_factor > 0.5:
+            growth = 1.2 * tech_factor * trust_factor
+            rev[I_PROC] += growth
+        else:
+            log_codes[1] = LOG_PROCESS_FAIL
+            
+    elif strategy_id == S_CLOUD:
+        # Needs High Tech & High Trust
+        if tech_factor > 0.7 and trust_factor > 0.7:
+            # Exponential Growth (J-Curve kicker)
+            existing = rev[I_CLOUD]
+            growth = 1.0 + (existing * 0.4) # 40% QoQ growth
+            rev[I_CLOUD] += growth
+            log_codes[1] = LOG_CLOUD_OK
+        else:
+            log_codes[1] = LOG_CLOUD_FAIL
+            metrics[I_TRUST] -= 10
+            cash -= 2.0 # Penalty for failed launch cleanup
+
+    return rev, metrics, cash, log_codes
+
+@st.cache_resource
+def _get_step():
+    # Compile _step() once per process (and to Numba's on-disk cache) so no quarter pays the JIT cost
+    from numba import njit
+    step = njit(cache=True)(_step)
+    step(np.zeros(4), np.zeros(3), 0.0, S_DEFEND, 0.0, 0.0, 0.0)
+    return step
 
 # --- Main UI ---
 st.set_page_config(page_title="Apex-Orion Strategy Sim", layout="wide")
 st.title("🏭 Industrial IoT Strategy Simulator")
 st.markdown("### Challenge: Survive the 'Swallow the Fish' Curve")
 st.caption("Based on Apex Precision & Orion Logistics Case Studies")
+_get_step()
 
 # Sidebar Stats
-with st.sidebar:
+@st.fragment
+def render_sidebar():
     st.header(f"QUARTER {st.session_state.quarter} / {QUARTERS_TOTAL}")
     
     cash_color = "normal"
@@ -74,9 +185,9 @@ with st.sidebar:
     
     st.divider()
     st.write("### 📊 Organization Health")
-    st.progress(st.session_state.metrics["Tech_Maturity"]/100, text="Tech Maturity (Product)")
-    st.progress(st.session_state.metrics["Sales_Morale"]/100, text="Sales Morale (Culture)")
-    st.progress(st.session_state.metrics["Customer_Trust"]/100, text="Customer Trust (Brand)")
+    st.progress(int(round(st.session_state.metrics[I_TECH])), text="Tech Maturity (Product)")
+    st.progress(int(round(st.session_state.metrics[I_SALES])), text="Sales Morale (Culture)")
+    st.progress(int(round(st.session_state.metrics[I_TRUST])), text="Customer Trust (Brand)")
     
     st.divider()
     if st.button("Restart Simulation"):
@@ -84,6 +195,9 @@ with st.sidebar:
             del st.session_state[key]
         st.rerun()
 
+with st.sidebar:
+    render_sidebar()
+
 # --- Game Over Check ---
 if st.session_state.cash < 0:
     st.error("💔 BANKRUPTCY! You ran out of cash. The Board has fired you.")
@@ -124,115 +238,64 @@ with col1:
         st.divider()
         
         st.markdown("**Strategic Priority (Select One):**")
-        strategy = st.radio("Focus:", [
-            "Defend Core (Hardware)",
-            "Launch Service (Predictive Maint)", 
-            "Launch Process (Optimization)", 
-            "Launch Cloud (Platform)"
-        ], horizontal=True)
+        strategy = st.radio("Focus:", STRATEGY_OPTIONS, horizontal=True)
         
         submit = st.form_submit_button("👉 Execute Quarter")
 
 with col2:
     st.subheader("Event Log")
-    for log in st.session_state.logs[:4]:
+    for log in list(st.session_state.logs)[:4]:
         st.write(log)
     
     st.subheader("Revenue Mix")
-    rev_df = pd.DataFrame.from_dict(st.session_state.revenue, orient='index', columns=['Revenue'])
-    st.bar_chart(rev_df)
+    st.bar_chart(_rev_series(tuple(st.session_state.rev.tolist())))
 
 # --- Game Logic Engine ---
 if submit:
+    step = _get_step()
+    m = st.session_state.metrics
+    rev = st.session_state.rev
+    cash = st.session_state.cash
+    quarter = st.session_state.quarter
+
     # 1. Financials
     total_spend = spend_rd + spend_change + spend_marketing
     burn_rate = 1.0 # Fixed Ops Cost
     
-    # 2. Update Organizational Metrics (The "Soft" Skills)
-    # R&D increases Tech, but decays slightly
-    st.session_state.metrics["Tech_Maturity"] += (spend_rd * 4) - 1
-    
-    # Change Mgmt increases Morale. If you spend 0, Morale tanks (Apex Scenario)
-    if spend_change < 0.5:
-        st.session_state.metrics["Sales_Morale"] -= 10
-        log_event("Sales team demoralized due to lack of training!", "warning")
-    else:
-        st.session_state.metrics["Sales_Morale"] += (spend_change * 3)
-        
-    # Marketing increases Trust
-    st.session_state.metrics["Customer_Trust"] += (spend_marketing * 3) - 0.5
-    
-    # Cap metrics at 100
-    for k in st.session_state.metrics:
-        st.session_state.metrics[k] = max(0, min(100, st.session_state.metrics[k]))
-
-    # 3. Calculate Revenue Impact based on Strategy
-    
-    # Multipliers based on Org Health
-    tech_factor = st.session_state.metrics["Tech_Maturity"] / 100
-    sales_factor = st.session_state.metrics["Sales_Morale"] / 100
-    trust_factor = st.session_state.metrics["Customer_Trust"] / 100
-    
-    # BASE DECLINE of Traditional Hardware (Commoditization)
-    st.session_state.revenue["Traditional"] *= 0.95 
-    
-    if strategy == "Defend Core (Hardware)":
-        st.session_state.revenue["Traditional"] *= 1.03 # Mitigate decline
-        
-    elif strategy == "Launch Service (Predictive Maint)":
-        # Low Tech requirement, High Sales requirement
-        growth = 1.5 * sales_factor
-        st.session_state.revenue["Service"] += growth
-        # Cannibalization Effect (Apex)
-        st.session_state.revenue["Traditional"] -= (growth * MODELS["Service"]["cannibalization"])
-        log_event("Service contracts growing. Spare parts revenue declining.", "info")
-
-    elif strategy == "Launch Process (Optimization)":
-        # Needs Trust and Tech
-        if trust_factor > 0.5:
-            growth = 1.2 * tech_factor * trust_factor
-            st.session_state.revenue["Process"] += growth
-        else:
-            log_event("Process Launch Failed! Trust too low.", "danger")
-            
-    elif strategy == "Launch Cloud (Platform)":
-        # Needs High Tech & High Trust
-        if tech_factor > 0.7 and trust_factor > 0.7:
-            # Exponential Growth (J-Curve kicker)
-            existing = st.session_state.revenue["Cloud"]
-            growth = 1.0 + (existing * 0.4) # 40% QoQ growth
-            st.session_state.revenue["Cloud"] += growth
-            log_event("Cloud Platform scaling!", "success")
-        else:
-            log_event("Cloud Launch Disaster! Product buggy or no trust.", "danger")
-            st.session_state.metrics["Customer_Trust"] -= 10
-            st.session_state.cash -= 2.0 # Penalty for failed launch cleanup
+    # 2-3. Organizational Metrics & Revenue Impact (compiled step)
+    strategy_id = STRATEGY_IDX[strategy]
+    rev, m, cash, log_codes = step(rev, m, cash, strategy_id, spend_rd, spend_change, spend_marketing)
+    for code in log_codes:
+        if code != LOG_NONE:
+            log_event(*LOG_MESSAGES[code])
 
     # 4. Cash Flow Calculation
-    gross_profit = 0
-    for model, amt in st.session_state.revenue.items():
-        gross_profit += amt * MODELS[model]["margin"]
+    gross_profit = float(rev @ _margins())
     
     net_change = gross_profit - total_spend - burn_rate
-    st.session_state.cash += net_change
+    cash += net_change
     
     # 5. Random Events (Chaos Monkey)
-    rng = np.random.random()
-    if st.session_state.quarter == 4 and rng > 0.3:
+    rng = st.session_state.rng_draws[quarter]
+    if quarter == 4 and rng > 0.3:
         log_event("Competitor slashes hardware prices by 20%. Core revenue hit.", "warning")
-        st.session_state.revenue["Traditional"] *= 0.8
-    elif st.session_state.quarter == 8 and st.session_state.metrics["Tech_Maturity"] < 50:
+        rev[I_TRAD] *= 0.8
+    elif quarter == 8 and m[I_TECH] < 50:
         log_event("Major sensor failure at client site! Trust tanks.", "danger")
-        st.session_state.metrics["Customer_Trust"] -= 20
-        st.session_state.cash -= 1.0
+        m[I_TRUST] -= 20
+        cash -= 1.0
 
     # 6. Update History & Turn
-    st.session_state.history = pd.concat([st.session_state.history, pd.DataFrame([{
-        "Quarter": st.session_state.quarter,
-        "Cash": st.session_state.cash,
-        "Valuation": calculate_valuation(),
-        "Revenue": sum(st.session_state.revenue.values())
-    }])], ignore_index=True)
-    
-    st.session_state.quarter += 1
+    st.session_state.rev = rev
+    st.session_state.metrics = m
+    st.session_state.cash = cash
+    new_val = calculate_valuation()
+    st.session_state.history_rows.append({
+        "Quarter": quarter,
+        "Cash": cash,
+        "Valuation": new_val,
+        "Revenue": float(rev.sum())
+    })
+    
+    st.session_state.quarter = quarter + 1
     st.rerun()